@@ -0,0 +1,78 @@
+"""
+Helpers for the JSON API (/api/v1) of the College Event Management application.
+
+* AppJSONProvider lets jsonify() serialize MongoDB documents and the
+  records from repository.py directly: ObjectId becomes its hex string
+  and datetime ISO 8601, with no per-document conversion loop in the
+  routes.
+* parse_fields() turns a `fields=a,b` query argument into a projection,
+  so only the requested fields are read from MongoDB and sent.
+* gzip_response() compresses larger JSON responses for clients that
+  accept it.
+"""
+
+import gzip
+from datetime import datetime
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+from repository import Record
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 500
+GZIP_LEVEL = 6
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    """JSON provider that understands ObjectId and records and emits ISO 8601 datetimes."""
+
+    compact = True
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        if isinstance(o, datetime):
+            return o.isoformat()
+        if isinstance(o, Record):
+            return o.as_dict()
+        return DefaultJSONProvider.default(o)
+
+
+def parse_fields(raw, allowed):
+    """
+    Projection for a comma-separated `fields` argument, limited to
+    `allowed`. All allowed fields are returned when raw is empty.
+    Raises ValueError naming any unknown field.
+    """
+    if not raw:
+        requested = list(allowed)
+    else:
+        requested = [field.strip() for field in raw.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return {field: 1 for field in requested}
+
+
+def public_document(doc):
+    """Rename _id to id for API output."""
+    doc['id'] = doc.pop('_id')
+    return doc
+
+
+def gzip_response(response, accept_encoding):
+    """Gzip a JSON response in place if the client accepts it and it is worth it."""
+    if ('gzip' not in accept_encoding.lower()
+            or response.status_code != 200
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json'):
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
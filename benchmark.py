@@ -0,0 +1,379 @@
+"""
+Per-route latency benchmark for the College Event Management application.
+
+Seeds a dataset through the Flask test client (the same forms a user
+submits), then times each benchmarked route and reports p50/p95/p99
+latency, throughput and database round trips per request:
+
+    python benchmark.py --backend memory
+    python benchmark.py --backend mongodb --database college_events_benchmark
+
+The mongodb backend uses the server from config.json / MONGODB_* (see
+database.py) but always works in its own database, which is dropped and
+re-seeded on every run. Round trips are counted per request: commands
+sent by this thread for mongodb, operations for the memory backend.
+Notification jobs run inline so their writes count towards the request
+that caused them.
+
+Use --save-baseline to record a run and --baseline to compare a later run
+with it. A route making more round trips per request than in the baseline
+(an N+1 query creeping in) fails the run with exit status 1. Latency is
+machine-dependent, so p95 regressions beyond --latency-tolerance are only
+reported unless --strict-latency is given.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+BENCHMARK_DATABASE = 'college_events_benchmark'
+PASSWORD = 'benchmark'
+PHONE = '9876543210'
+
+ROUTES = ('login', 'dashboard', 'view_events', 'register_event', 'my_registrations',
+          'all_registrations', 'view_registrations', 'notifications')
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# ---------------- ROUND TRIP COUNTING -----------------
+class CommandCounter:
+    """Counts MongoDB commands started by the benchmark thread."""
+
+    def __init__(self):
+        from pymongo import monitoring
+
+        counter = self
+        self.count = 0
+        self.thread_id = threading.get_ident()
+
+        class Listener(monitoring.CommandListener):
+            def started(self, event):
+                if threading.get_ident() == counter.thread_id:
+                    counter.count += 1
+
+            def succeeded(self, event):
+                pass
+
+            def failed(self, event):
+                pass
+
+        # Applies to clients created afterwards, so register before the app connects
+        monitoring.register(Listener())
+
+    def value(self, db):
+        return self.count
+
+
+class OperationCounter:
+    """Reads the in-memory backend's own round trip counter."""
+
+    def value(self, db):
+        return db.counters['round_trips']
+
+
+# ---------------- DATASET -----------------
+def quiet(func, *args, **kwargs):
+    """Call func with stdout suppressed (register prints every attempt)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def clear_flashes(client):
+    """Drop flash messages a redirect left in the session, so they do not pile up"""
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+
+
+def login(app, email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302 or '/dashboard' not in response.headers.get('Location', ''):
+        raise RuntimeError(f"Could not log in as {email}")
+    return client
+
+
+def seed(app, db, students, events, registrations_per_student):
+    """
+    Create the users, events and registrations through the app's own forms.
+    Returns (admin client, student clients, event ids).
+    """
+    anonymous = app.test_client()
+    accounts = [('Benchmark Admin', 'admin@benchmark.test', 'admin')]
+    accounts += [(f"Student {i}", f"student{i}@benchmark.test", 'student') for i in range(students)]
+    for name, email, role in accounts:
+        quiet(anonymous.post, '/register', data={'name': name, 'email': email, 'password': PASSWORD, 'role': role})
+
+    admin = login(app, 'admin@benchmark.test')
+    # One event per day from tomorrow on, so registrations never clash in time
+    first_day = datetime.now().date() + timedelta(days=1)
+    for i in range(events):
+        admin.post('/add_event', data={
+            'title': f"Benchmark Event {i}",
+            'description': f"Seeded event number {i} for the route benchmark",
+            'date': (first_day + timedelta(days=i)).isoformat(),
+            'hour': '10',
+            'minute': '00',
+            'ampm': 'AM',
+            'location': f"Hall {i % 5}",
+            'duration_minutes': '60',
+        })
+        clear_flashes(admin)
+    event_ids = [str(event['_id']) for event in db.events.find({}, {'_id': 1}).sort('date', 1)]
+    if len(event_ids) != events:
+        raise RuntimeError(f"Expected {events} seeded events, found {len(event_ids)}")
+
+    clients = [login(app, f"student{i}@benchmark.test") for i in range(students)]
+    for client in clients:
+        for event_id in event_ids[:registrations_per_student]:
+            client.post(f"/register_event/{event_id}", data={'phone': PHONE, 'comments': 'seeded'})
+            clear_flashes(client)
+    return admin, clients, event_ids
+
+
+# ---------------- ROUTE DRIVERS -----------------
+def route_requests(app, admin, students, event_ids, registrations_per_student):
+    """
+    For each route, a function taking the iteration number and returning
+    (test client, callable that sends the request).
+    """
+    open_events = event_ids[registrations_per_student:]
+
+    def login_request(i):
+        client = app.test_client()
+        return client, lambda: client.post('/login', data={'email': f"student{i % len(students)}@benchmark.test",
+                                                           'password': PASSWORD})
+
+    def register_request(i):
+        # Every iteration registers a different student for a different event
+        client = students[i % len(students)]
+        event_id = open_events[i // len(students)]
+        return client, lambda: client.post(f"/register_event/{event_id}", data={'phone': PHONE, 'comments': ''})
+
+    def get(client_for, path_for):
+        def request(i):
+            client = client_for(i)
+            path = path_for(i)
+            return client, lambda: client.get(path)
+        return request
+
+    student = lambda i: students[i % len(students)]
+    return {
+        'login': login_request,
+        'dashboard': get(student, lambda i: '/dashboard'),
+        'view_events': get(student, lambda i: '/events'),
+        'register_event': register_request,
+        'my_registrations': get(student, lambda i: '/my-registrations'),
+        'all_registrations': get(lambda i: admin, lambda i: '/all_registrations'),
+        'view_registrations': get(lambda i: admin, lambda i: f"/view_registrations/{event_ids[i % len(event_ids)]}"),
+        'notifications': get(student, lambda i: '/notifications'),
+    }
+
+
+def run_route(make_request, db, counter, iterations, warmup):
+    """
+    Time iterations requests after warmup untimed ones. Returns the route's result dict.
+    A request counts as an error if it returns an error status or flashes a
+    'danger' message: most routes report failures with a flash and a redirect.
+    """
+    from flask import message_flashed
+
+    danger_flashes = []
+
+    def record_flash(sender, message, category, **extra):
+        if category == 'danger':
+            danger_flashes.append(message)
+
+    latencies = []
+    round_trips = []
+    errors = 0
+    with message_flashed.connected_to(record_flash):
+        for i in range(warmup + iterations):
+            client, send = make_request(i)
+            danger_flashes.clear()
+            before = counter.value(db)
+            start = time.perf_counter()
+            response = send()
+            elapsed = time.perf_counter() - start
+            trips = counter.value(db) - before
+            clear_flashes(client)
+            if i < warmup:
+                continue
+            if response.status_code >= 400 or danger_flashes:
+                errors += 1
+            latencies.append(elapsed * 1000)
+            round_trips.append(trips)
+    # Requests are sent one at a time, so throughput is one client's rate,
+    # excluding the harness's own work between requests
+    total = sum(latencies) / 1000
+
+    latencies.sort()
+    return {
+        'requests': iterations,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'throughput_rps': round(iterations / total, 1) if total else None,
+        'round_trips_mean': round(sum(round_trips) / len(round_trips), 2),
+        'round_trips_max': max(round_trips),
+    }
+
+
+# ---------------- BASELINE -----------------
+def compare(results, baseline, latency_tolerance):
+    """Returns (failures, warnings) comparing results with a saved baseline"""
+    failures, warnings = [], []
+    if baseline.get('backend') != results['backend']:
+        warnings.append(f"baseline was recorded with the {baseline.get('backend')} backend, "
+                        "which counts round trips differently")
+    if baseline.get('dataset') != results['dataset']:
+        warnings.append(f"dataset differs from the baseline's {baseline.get('dataset')}; "
+                        "round trips may not be comparable")
+    # Cache misses are spread over all requests, so mean round trips are
+    # only comparable between runs of the same length
+    keys = ('round_trips_mean', 'round_trips_max')
+    if baseline.get('iterations') != results['iterations']:
+        warnings.append(f"baseline ran {baseline.get('iterations')} iterations per route; "
+                        "only maximum round trips are compared")
+        keys = ('round_trips_max',)
+    for route, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(route)
+        if previous is None:
+            continue
+        for key in keys:
+            # Round trips are deterministic, so any increase is a regression
+            if current[key] > previous[key] + 1e-9:
+                failures.append(f"{route}: {key} rose from {previous[key]} to {current[key]}")
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + latency_tolerance):
+            warnings.append(f"{route}: p95 rose from {previous['p95_ms']} ms to {current['p95_ms']} ms")
+    return failures, warnings
+
+
+def print_report(results):
+    print(f"\nBackend: {results['backend']}   dataset: {results['dataset']}")
+    header = f"{'route':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'trips':>8}{'max':>5}{'errors':>8}"
+    print(header)
+    print('-' * len(header))
+    for route, r in results['routes'].items():
+        print(f"{route:<20}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['throughput_rps']:>9.1f}{r['round_trips_mean']:>8.2f}{r['round_trips_max']:>5}{r['errors']:>8}")
+
+
+# ---------------- MAIN -----------------
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--backend', choices=('memory', 'mongodb'), default='memory')
+    parser.add_argument('--database', default=BENCHMARK_DATABASE,
+                        help='database to seed; dropped first (mongodb backend)')
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--events', type=int, default=40)
+    parser.add_argument('--registrations-per-student', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per route first')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated routes to run')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write the results as the new baseline')
+    parser.add_argument('--baseline', metavar='FILE', help='compare with a saved baseline')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help='allowed p95 increase over the baseline, as a fraction (default 0.5)')
+    parser.add_argument('--strict-latency', action='store_true', help='fail on p95 regressions too')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.routes.split(',')) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+    open_pairs = args.students * (args.events - args.registrations_per_student)
+    if 'register_event' in args.routes and open_pairs < args.warmup + args.iterations:
+        parser.error("not enough unregistered (student, event) pairs for register_event; "
+                     "add students or events, or lower --iterations")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    app_database = os.environ.get('MONGODB_DATABASE', 'college_events')
+    # Configure the app before it is imported
+    os.environ['STORAGE_BACKEND'] = args.backend
+    os.environ['MONGODB_DATABASE'] = args.database
+    os.environ['JOBS_SYNCHRONOUS'] = '1'
+    counter = CommandCounter() if args.backend == 'mongodb' else OperationCounter()
+
+    import app as app_module
+    protected = {app_database}
+    if os.path.exists(app_module.config_path):
+        protected.add(app_module.MONGO_CONFIG.get('database', 'college_events'))
+    if args.backend == 'mongodb' and args.database in protected:
+        sys.exit(f"Refusing to drop the application's own database '{args.database}'")
+    app_module.MONGO_CONFIG['database'] = args.database
+    app_module.MONGO_CONFIG['backend'] = args.backend
+    app = app_module.app
+
+    db = app_module.get_db_connection()
+    if db is None:
+        sys.exit("Could not connect to the database")
+    db.client.drop_database(args.database)
+    # Reconnect so the startup index creation runs against the empty database
+    app_module.db_manager.close()
+    db = app_module.get_db_connection()
+
+    print(f"Seeding {args.students} students, {args.events} events, "
+          f"{args.registrations_per_student} registrations per student...")
+    admin, students, event_ids = seed(app, db, args.students, args.events, args.registrations_per_student)
+
+    requests = route_requests(app, admin, students, event_ids, args.registrations_per_student)
+    results = {
+        'backend': args.backend,
+        'dataset': {'students': args.students, 'events': args.events,
+                    'registrations_per_student': args.registrations_per_student},
+        'iterations': args.iterations,
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'routes': {},
+    }
+    for route in args.routes.split(','):
+        results['routes'][route] = run_route(requests[route], db, counter, args.iterations, args.warmup)
+    print_report(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+            print(f"Results written to {path}")
+
+    failed = any(r['errors'] for r in results['routes'].values())
+    if failed:
+        print("FAIL: some requests returned an error status or flashed an error")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures, warnings = compare(results, baseline, args.latency_tolerance)
+        for message in warnings:
+            print(f"WARNING: {message}")
+        if args.strict_latency:
+            failures += [message for message in warnings if ' p95 ' in message]
+        for message in failures:
+            print(f"REGRESSION: {message}")
+        if failures:
+            failed = True
+        else:
+            print(f"No round trip regressions against {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
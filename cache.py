@@ -0,0 +1,162 @@
+"""
+In-process caching for the College Event Management application.
+
+TTLCache is a bounded LRU map whose entries also expire after a fixed
+time. SharedSnapshot holds one value that every request shares and that
+is recomputed by a single thread at a time. Each gunicorn worker has its
+own instances, so an explicit invalidate() only reaches the worker that
+made the change; the TTL bounds how long other workers can serve the old
+value.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from database import env_int
+
+EVENT_CACHE_SIZE = env_int('EVENT_CACHE_SIZE', 1024)
+EVENT_CACHE_TTL_SECONDS = env_int('EVENT_CACHE_TTL_SECONDS', 60)
+SNAPSHOT_TTL_SECONDS = env_int('DASHBOARD_SNAPSHOT_TTL_SECONDS', 30)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize=EVENT_CACHE_SIZE, ttl=EVENT_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted': 0,
+            'invalidated': 0,
+        }
+
+    def get(self, key):
+        """Return the cached value, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            value, expires_at = entry
+            if self._clock() >= expires_at:
+                del self._entries[key]
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counters['evicted'] += 1
+
+    def get_or_load(self, key, load):
+        """
+        Read-through: return the cached value or call load() and cache its
+        result. None results are not cached.
+        """
+        value = self.get(key)
+        if value is None:
+            value = load()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.counters['invalidated'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters, current size and hit ratio for sizing the cache."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else None
+        stats['max_size'] = self.maxsize
+        stats['ttl_seconds'] = self.ttl
+        return stats
+
+
+class SharedSnapshot:
+    """
+    A value computed by `load()` and shared by all threads for `ttl` seconds.
+
+    Only one thread recomputes an expired value; meanwhile the others keep
+    getting the previous one instead of all querying the database at once.
+    Threads only wait when there is no previous value at all. If a reload
+    fails, the previous value is served until a later reload succeeds.
+    """
+
+    def __init__(self, load, ttl=SNAPSHOT_TTL_SECONDS, clock=time.monotonic):
+        self._load = load
+        self.ttl = ttl
+        self._clock = clock
+        self._refresh_lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0.0
+        self.counters = {
+            'hits': 0,
+            'stale_served': 0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+        }
+
+    def get(self):
+        value = self._value
+        if value is not None and self._clock() < self._expires_at:
+            self.counters['hits'] += 1
+            return value
+
+        # Wait for a refresh in progress only if there is nothing to serve yet
+        if not self._refresh_lock.acquire(blocking=value is None):
+            self.counters['stale_served'] += 1
+            return value
+        try:
+            if self._value is not None and self._clock() < self._expires_at:
+                # Refreshed by another thread while we waited
+                self.counters['hits'] += 1
+                return self._value
+            try:
+                value = self._load()
+            except Exception as e:
+                self.counters['refresh_failures'] += 1
+                if self._value is None:
+                    raise
+                logging.error(f"Snapshot refresh failed, serving previous value: {e}")
+                self.counters['stale_served'] += 1
+                return self._value
+            self._value = value
+            self._expires_at = self._clock() + self.ttl
+            self.counters['refreshes'] += 1
+            return value
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self):
+        """Recompute on the next get(). The old value is kept to serve during the refresh."""
+        self._expires_at = 0.0
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['ttl_seconds'] = self.ttl
+        stats['age_seconds'] = (round(self.ttl - (self._expires_at - self._clock()), 3)
+                                if self._value is not None and self._expires_at else None)
+        return stats
@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for the College Event Management application.
+Values can be overridden with the environment variables shown.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Threaded workers share one MongoDB connection pool per process
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def post_fork(server, worker):
+    # Never reuse a MongoDB client created in the master (e.g. with --preload)
+    from app import db_manager
+    db_manager.reset_after_fork()
+
+
+def worker_exit(server, worker):
+    # Finish queued notifications while the database client is still open
+    from app import db_manager, job_queue
+    job_queue.drain()
+    db_manager.close()
@@ -0,0 +1,118 @@
+"""
+MongoDB index catalogue for the College Event Management application.
+Every index the app relies on is declared here so it can be created
+idempotently at startup, from the Flask CLI, or by init_mongodb.py.
+"""
+
+import logging
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from search import TEXT_WEIGHTS
+
+# collection name -> list of IndexModel
+INDEX_CATALOGUE = {
+    "users": [
+        # login, register and forgot_password look users up by email
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # reset_password looks up by token; only users with a pending reset are indexed
+        IndexModel([("reset_token", ASCENDING)], name="reset_token",
+                   partialFilterExpression={"reset_token": {"$type": "string"}}),
+    ],
+    "events": [
+        # dashboard and events listing filter on date; the listing pages on (date, _id)
+        IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id"),
+        # events listing location filter, and the distinct locations for its dropdown
+        IndexModel([("location", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="location_date_id"),
+        # Event search (see search.py); MongoDB allows one text index per collection
+        IndexModel([(field, TEXT) for field in TEXT_WEIGHTS], name="event_text", weights=TEXT_WEIGHTS),
+        # Search box autocomplete, prefix matches on title words
+        IndexModel([("title_keywords", ASCENDING)], name="title_keywords"),
+    ],
+    "registrations": [
+        # At most one active registration per student and event; register_event
+        # relies on this to make its upsert race-free
+        IndexModel([("student_id", ASCENDING), ("event_id", ASCENDING)], name="student_event_active_unique",
+                   unique=True, partialFilterExpression={"status": "active"}),
+        # At most one waitlist entry per student and event. The key differs from
+        # the index above because servers before MongoDB 5.0 reject two indexes
+        # on the same key that differ only by partialFilterExpression
+        IndexModel([("student_id", ASCENDING), ("event_id", ASCENDING), ("status", ASCENDING)],
+                   name="student_event_status_waitlisted_unique",
+                   unique=True, partialFilterExpression={"status": "waitlisted"}),
+        # Waitlist promotion takes the lowest position for an event
+        IndexModel([("event_id", ASCENDING), ("waitlist_position", ASCENDING)], name="event_waitlist_position",
+                   partialFilterExpression={"status": "waitlisted"}),
+        # register_event schedule-conflict range query (see scheduling.py), my_registrations
+        IndexModel([("student_id", ASCENDING), ("status", ASCENDING), ("event_start", ASCENDING)],
+                   name="student_status_event_start"),
+        # view_registrations, and all_registrations filtered by event
+        IndexModel([("event_id", ASCENDING), ("registered_at", DESCENDING), ("_id", DESCENDING)],
+                   name="event_registered_at_id"),
+        # all_registrations filtered by status
+        IndexModel([("status", ASCENDING), ("registered_at", DESCENDING), ("_id", DESCENDING)],
+                   name="status_registered_at_id"),
+        # /api/v1/registrations keyset pagination
+        IndexModel([("student_id", ASCENDING), ("registered_at", DESCENDING), ("_id", DESCENDING)],
+                   name="student_registered_at_id"),
+        # all_registrations keyset pagination
+        IndexModel([("registered_at", DESCENDING), ("_id", DESCENDING)], name="registered_at_id"),
+    ],
+    "notifications": [
+        # get_user_notifications keyset pagination
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="user_created_at_id"),
+        # Same, unread only; small because read notifications are left out
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="user_unread_created_at_id", partialFilterExpression={"is_read": False}),
+    ],
+}
+
+
+def ensure_indexes(db):
+    """
+    Create every index in INDEX_CATALOGUE. Safe to call repeatedly; indexes
+    that already exist with the same definition are left alone.
+    Returns a list of error messages (empty if everything was applied).
+    """
+    errors = []
+    for collection_name, models in INDEX_CATALOGUE.items():
+        try:
+            db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. duplicate emails blocking the unique index, or an existing
+            # index with the same name but different options
+            message = f"{collection_name}: {e}"
+            logging.error(f"Index creation failed for {message}")
+            errors.append(message)
+    if not errors:
+        logging.info("Database indexes verified")
+    return errors
+
+
+def index_report(db):
+    """
+    Compare the catalogue with the indexes present on the server.
+    Returns {collection: {"missing": [...], "extra": [...], "unused": [...]}}.
+    "unused" lists indexes with no recorded accesses since the server
+    (or index) was last started, when $indexStats is available.
+    """
+    report = {}
+    for collection_name, models in INDEX_CATALOGUE.items():
+        collection = db[collection_name]
+        expected = {model.document["name"] for model in models}
+        present = set(collection.index_information().keys()) - {"_id_"}
+
+        unused = []
+        try:
+            for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                    unused.append(stats["name"])
+        except OperationFailure as e:
+            logging.warning(f"$indexStats unavailable for {collection_name}: {e}")
+
+        report[collection_name] = {
+            "missing": sorted(expected - present),
+            "extra": sorted(present - expected),
+            "unused": sorted(unused),
+        }
+    return report
@@ -0,0 +1,181 @@
+"""
+In-process background jobs for the College Event Management application.
+
+Side effects that the user does not need to wait for (notifications, and
+later emails) are submitted to a JobQueue and run by a small pool of
+worker threads, so a request returns as soon as its primary write is
+done. The queue is bounded; when it is full, jobs run inline in the
+caller instead of being dropped. Failed jobs are retried with backoff.
+
+Worker threads do not survive fork(), so they are started lazily in the
+process that first submits a job, the same way database.py handles the
+MongoDB client. Set JOBS_SYNCHRONOUS=1 to run every job inline (e.g. in
+tests or one-off scripts).
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from database import env_int
+
+JOB_WORKERS = env_int('JOB_WORKERS', 2)
+JOB_QUEUE_SIZE = env_int('JOB_QUEUE_SIZE', 1000)
+JOB_MAX_ATTEMPTS = env_int('JOB_MAX_ATTEMPTS', 3)
+JOB_RETRY_BACKOFF = env_int('JOB_RETRY_BACKOFF_MS', 500) / 1000
+JOB_DRAIN_TIMEOUT = env_int('JOB_DRAIN_TIMEOUT_MS', 10000) / 1000
+
+# Queued in place of a job to tell a worker thread to exit
+_STOP = object()
+
+
+class JobQueue:
+    """
+    Bounded queue of callables run by `workers` daemon threads.
+    submit() never blocks the caller on a slow job.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, maxsize=JOB_QUEUE_SIZE, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_backoff=JOB_RETRY_BACKOFF, synchronous=None, sleep=time.sleep):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        if synchronous is None:
+            synchronous = os.environ.get('JOBS_SYNCHRONOUS', '').lower() in ('1', 'true', 'yes')
+        self.synchronous = synchronous
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._accepting = True
+        self.counters = {
+            'submitted': 0,
+            'completed': 0,
+            'retried': 0,
+            'failed': 0,
+            'ran_inline': 0,
+        }
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset_after_fork)
+
+    def reset_after_fork(self):
+        """Forget the parent's queue and threads in a forked child."""
+        self._lock = threading.Lock()
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._accepting = True
+
+    def _bump(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _ensure_started(self):
+        """Start the worker threads for this process if needed. Returns the queue."""
+        job_queue = self._queue
+        if job_queue is not None and self._pid == os.getpid():
+            return job_queue
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.maxsize)
+                self._pid = os.getpid()
+                self._threads = []
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._work, args=(self._queue,),
+                                              name=f"job-worker-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            return self._queue
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) in the background. Runs it inline when the
+        queue is synchronous, full, or draining.
+        """
+        self._bump('submitted')
+        if self.synchronous or not self._accepting:
+            self._run_inline(func, args, kwargs)
+            return
+        try:
+            self._ensure_started().put_nowait((func, args, kwargs))
+        except queue.Full:
+            logging.warning(f"Job queue full; running {func.__name__} inline")
+            self._run_inline(func, args, kwargs)
+
+    def _run_inline(self, func, args, kwargs):
+        self._bump('ran_inline')
+        self._run(func, args, kwargs)
+
+    def _run(self, func, args, kwargs):
+        """Run one job, retrying with exponential backoff. Never raises."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                func(*args, **kwargs)
+                self._bump('completed')
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logging.error(f"Job {func.__name__} failed after {attempt} attempts: {e}")
+                    self._bump('failed')
+                    return
+                logging.warning(f"Job {func.__name__} failed (attempt {attempt}), retrying: {e}")
+                self._bump('retried')
+                self._sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+    def _work(self, job_queue):
+        while True:
+            job = job_queue.get()
+            try:
+                if job is _STOP:
+                    return
+                func, args, kwargs = job
+                self._run(func, args, kwargs)
+            finally:
+                job_queue.task_done()
+
+    def drain(self, timeout=JOB_DRAIN_TIMEOUT):
+        """
+        Stop accepting background work, wait up to `timeout` seconds for
+        queued jobs to finish and stop the workers. Returns True if the
+        queue emptied in time.
+        """
+        self._accepting = False
+        job_queue = self._queue
+        if job_queue is None or self._pid != os.getpid():
+            return True
+
+        deadline = time.monotonic() + timeout
+        try:
+            for _ in self._threads:
+                # Waits only while the queue is full, which the workers are emptying
+                job_queue.put(_STOP, timeout=max(0.001, deadline - time.monotonic()))
+        except queue.Full:
+            pass
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        drained = not any(thread.is_alive() for thread in self._threads)
+        if not drained:
+            logging.warning(f"Job queue drain timed out with about {job_queue.qsize()} jobs left")
+        with self._lock:
+            self._queue = None
+            self._threads = []
+            self._pid = None
+        return drained
+
+    def stats(self):
+        """Queue statistics for monitoring."""
+        with self._lock:
+            stats = dict(self.counters)
+        job_queue = self._queue
+        running = job_queue is not None and self._pid == os.getpid()
+        stats.update({
+            'workers': len(self._threads) if running else 0,
+            'queued': job_queue.qsize() if running else 0,
+            'max_queue_size': self.maxsize,
+            'synchronous': self.synchronous,
+        })
+        return stats
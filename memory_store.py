@@ -0,0 +1,965 @@
+"""
+In-memory storage backend for the College Event Management application.
+
+MemoryClient stands in for pymongo's MongoClient when STORAGE_BACKEND is
+`memory` (see database.build_client). It implements the part of the
+MongoDB API the application uses: the query operators, sorts,
+projections, updates and aggregation stages in app.py, repository.py,
+search.py, scheduling.py and migrations.py, plus unique and partial
+indexes and the weighted text index from indexes.py. It raises the same
+pymongo exceptions (DuplicateKeyError, BulkWriteError, OperationFailure)
+so error handling is exercised as in production.
+
+Everything is kept in plain dicts in this process, so the whole app can
+be driven through Flask's test client without a server, and query costs
+can be measured without network latency. Each process has its own data:
+run gunicorn with a single worker if you use it there. Queries scan their
+collection (only _id lookups are direct), so it shows how many round
+trips a request makes, not how well MongoDB's indexes serve them.
+"""
+
+import functools
+import re
+import threading
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (BulkWriteResult, DeleteResult, InsertManyResult,
+                             InsertOneResult, UpdateResult)
+
+# Holds a document's text search score while a $text query runs; MongoDB
+# field names cannot start with '$', so it never collides with real fields
+_SCORE = '$textScore'
+_MISSING = object()
+_WORD = re.compile(r"\w+")
+
+# BSON comparison order of the types the app stores
+_TYPE_ORDER = {type(None): 0, int: 1, float: 1, str: 2, dict: 3, list: 4,
+               ObjectId: 5, bool: 6, datetime: 7}
+_TYPE_ALIASES = {'string': str, 'date': datetime, 'objectId': ObjectId, 'bool': bool,
+                 'int': int, 'double': float, 'object': dict, 'array': list, 'null': type(None)}
+
+
+# ---------------- DOCUMENT HELPERS -----------------
+def _copy(value):
+    """Copy a document deep enough that callers cannot change stored data."""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _get(doc, path):
+    """Value at a dotted path, or _MISSING."""
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set(doc, path, value):
+    *parents, last = path.split('.')
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc, path):
+    *parents, last = path.split('.')
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _hashable(value):
+    """A hashable form of a field value, for unique index keys."""
+    if value is _MISSING:
+        return None
+    if isinstance(value, dict):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _type_rank(value):
+    return _TYPE_ORDER.get(type(value), 8)
+
+
+def _compare(a, b):
+    """Order two values the way MongoDB sorts them: by type first, then by value."""
+    if a is _MISSING:
+        a = None
+    if b is _MISSING:
+        b = None
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if isinstance(a, dict):
+        a, b = list(a.items()), list(b.items())
+    if a == b:
+        return 0
+    try:
+        return -1 if a < b else 1
+    except TypeError:
+        return -1 if repr(a) < repr(b) else 1
+
+
+def _comparable(a, b):
+    """Range operators only match values of the same type bracket."""
+    return a is not _MISSING and _type_rank(a) == _type_rank(b)
+
+
+# ---------------- QUERIES -----------------
+def _candidates(value):
+    """The values a field condition is tested against: the value and, for arrays, each element."""
+    if isinstance(value, list):
+        return [value, *value]
+    return [value]
+
+
+def _match_operator(value, op, arg):
+    if op == '$eq':
+        return _match_value(value, arg)
+    if op == '$ne':
+        return not _match_value(value, arg)
+    if op in ('$gt', '$gte', '$lt', '$lte'):
+        for candidate in _candidates(value):
+            if not _comparable(candidate, arg):
+                continue
+            order = _compare(candidate, arg)
+            if ((op == '$gt' and order > 0) or (op == '$gte' and order >= 0)
+                    or (op == '$lt' and order < 0) or (op == '$lte' and order <= 0)):
+                return True
+        return False
+    if op == '$in':
+        return any(_match_value(value, item) for item in arg)
+    if op == '$nin':
+        return not any(_match_value(value, item) for item in arg)
+    if op == '$exists':
+        return (value is not _MISSING) == bool(arg)
+    if op == '$type':
+        expected = _TYPE_ALIASES[arg]
+        return any(type(candidate) is expected for candidate in _candidates(value) if candidate is not _MISSING)
+    if op == '$regex':
+        pattern = arg if hasattr(arg, 'search') else re.compile(arg)
+        return any(isinstance(candidate, str) and pattern.search(candidate) for candidate in _candidates(value))
+    if op == '$options':
+        return True
+    if op == '$all':
+        return isinstance(value, list) and all(_match_value(value, item) for item in arg)
+    if op == '$not':
+        return not _match_condition(value, arg)
+    raise OperationFailure(f"unknown operator: {op}", code=2)
+
+
+def _match_value(value, expected):
+    """Equality as MongoDB applies it: null matches missing, arrays match any element."""
+    if expected is None:
+        return value is _MISSING or value is None or (isinstance(value, list) and None in value)
+    return any(candidate is not _MISSING and _compare(candidate, expected) == 0
+               for candidate in _candidates(value))
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        if '$regex' in condition and 'i' in condition.get('$options', ''):
+            condition = dict(condition, **{'$regex': re.compile(condition['$regex'], re.IGNORECASE)})
+        return all(_match_operator(value, op, arg) for op, arg in condition.items())
+    if hasattr(condition, 'search'):
+        return _match_operator(value, '$regex', condition)
+    return _match_value(value, condition)
+
+
+def matches(doc, query):
+    """True if doc satisfies a MongoDB query document."""
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$expr':
+            if not evaluate(doc, condition):
+                return False
+        elif key == '$text':
+            if not doc.get(_SCORE):
+                return False
+        elif not _match_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+# ---------------- EXPRESSIONS -----------------
+def evaluate(doc, expr):
+    """Evaluate an aggregation expression against doc."""
+    if isinstance(expr, str) and expr.startswith('$'):
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, list):
+        return [evaluate(doc, item) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) == 1:
+        op, arg = next(iter(expr.items()))
+        if op.startswith('$'):
+            return _evaluate_operator(doc, op, arg)
+    return {key: evaluate(doc, value) for key, value in expr.items()}
+
+
+def _evaluate_operator(doc, op, arg):
+    if op == '$meta':
+        return doc.get(_SCORE, 0.0)
+    if op == '$literal':
+        return arg
+    args = [evaluate(doc, item) for item in arg] if isinstance(arg, list) else [evaluate(doc, arg)]
+    if op in ('$eq', '$ne', '$gt', '$gte', '$lt', '$lte'):
+        order = _compare(args[0], args[1])
+        return {'$eq': order == 0, '$ne': order != 0, '$gt': order > 0, '$gte': order >= 0,
+                '$lt': order < 0, '$lte': order <= 0}[op]
+    if op == '$ifNull':
+        return next((value for value in args if value is not None), None)
+    if op == '$substrCP':
+        text, start, length = args
+        return (text or '')[start:start + length]
+    if op == '$arrayElemAt':
+        array, index = args
+        if not isinstance(array, list) or not -len(array) <= index < len(array):
+            return None
+        return array[index]
+    if op == '$size':
+        return len(args[0] or [])
+    if op == '$toString':
+        return None if args[0] is None else str(args[0])
+    if op in ('$and', '$or'):
+        return all(args) if op == '$and' else any(args)
+    if op == '$not':
+        return not args[0]
+    if op == '$add':
+        return sum(args)
+    if op == '$subtract':
+        return args[0] - args[1]
+    raise OperationFailure(f"Unrecognized expression '{op}'", code=168)
+
+
+# ---------------- PROJECTION AND SORT -----------------
+def _project(doc, projection):
+    """Apply a find or $project projection."""
+    if not projection:
+        return {key: value for key, value in doc.items() if key != _SCORE}
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    include_id = projection.get('_id', 1) not in (0, False)
+    fields = {key: value for key, value in projection.items() if key != '_id'}
+    excluding = fields and all(value in (0, False) for value in fields.values())
+    if not fields and not include_id:
+        excluding = True
+
+    if excluding:
+        result = _copy({key: value for key, value in doc.items() if key != _SCORE})
+        for path in fields:
+            _unset(result, path)
+        if not include_id:
+            result.pop('_id', None)
+        return result
+
+    result = {}
+    if include_id and '_id' in doc:
+        result['_id'] = doc['_id']
+    for path, spec in fields.items():
+        if spec in (1, True):
+            _include(result, doc, path.split('.'))
+        elif isinstance(spec, str) and spec.startswith('$'):
+            # Like MongoDB, a field path that is missing leaves the field out
+            value = _get(doc, spec[1:])
+            if value is not _MISSING:
+                _set(result, path, value)
+        else:
+            _set(result, path, evaluate(doc, spec))
+    return result
+
+
+def _include(result, source, parts):
+    """Copy the value at parts from source into result, through sub-documents and arrays."""
+    head, *rest = parts
+    if not isinstance(source, dict) or head not in source:
+        return
+    value = source[head]
+    if not rest:
+        result[head] = _copy(value)
+    elif isinstance(value, dict):
+        _include(result.setdefault(head, {}), value, rest)
+    elif isinstance(value, list):
+        items = result.setdefault(head, [{} for _ in value])
+        for target, item in zip(items, value):
+            _include(target, item, rest)
+
+
+def _sort_spec(sort):
+    if isinstance(sort, str):
+        return [(sort, 1)]
+    if isinstance(sort, dict):
+        return list(sort.items())
+    return list(sort)
+
+
+def _sort(docs, sort):
+    spec = _sort_spec(sort)
+
+    def key_value(doc, key, direction):
+        if isinstance(direction, dict):
+            # {"$meta": "textScore"}: highest score first
+            return doc.get(_SCORE, 0.0), -1
+        value = _get(doc, key)
+        if isinstance(value, list) and value:
+            value = min(value, key=functools.cmp_to_key(_compare)) if direction == 1 else \
+                max(value, key=functools.cmp_to_key(_compare))
+        return value, direction
+
+    def compare(a, b):
+        for key, direction in spec:
+            value_a, order = key_value(a, key, direction)
+            value_b, _ = key_value(b, key, direction)
+            result = _compare(value_a, value_b)
+            if result:
+                return result * order
+        return 0
+
+    return sorted(docs, key=functools.cmp_to_key(compare))
+
+
+# ---------------- UPDATES -----------------
+def _apply_update(doc, update, inserting=False):
+    if not any(key.startswith('$') for key in update):
+        # Replacement document
+        doc_id = doc.get('_id')
+        doc.clear()
+        doc.update(_copy(update))
+        if doc_id is not None:
+            doc['_id'] = doc_id
+        return
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == '$set' or (op == '$setOnInsert' and inserting):
+                _set(doc, path, _copy(value))
+            elif op == '$inc':
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING or current is None else current) + value)
+            elif op == '$unset':
+                _unset(doc, path)
+            elif op == '$push':
+                current = _get(doc, path)
+                _set(doc, path, (current if isinstance(current, list) else []) + [_copy(value)])
+            elif op == '$max':
+                current = _get(doc, path)
+                if current is _MISSING or _compare(value, current) > 0:
+                    _set(doc, path, value)
+            elif op == '$min':
+                current = _get(doc, path)
+                if current is _MISSING or _compare(value, current) < 0:
+                    _set(doc, path, value)
+            elif op != '$setOnInsert':
+                raise OperationFailure(f"Unknown modifier: {op}", code=9)
+
+
+def _upsert_seed(query):
+    """The equality fields of a query, which an upsert copies into the new document."""
+    seed = {}
+    for key, condition in query.items():
+        if key == '$and':
+            for sub in condition:
+                seed.update(_upsert_seed(sub))
+        elif key.startswith('$'):
+            continue
+        elif isinstance(condition, dict) and any(op.startswith('$') for op in condition):
+            if '$eq' in condition:
+                _set(seed, key, _copy(condition['$eq']))
+        else:
+            _set(seed, key, _copy(condition))
+    return seed
+
+
+# ---------------- CURSOR -----------------
+class MemoryCursor:
+    """The chainable part of pymongo's Cursor: sort, skip, limit and batch_size."""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else key_or_list
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _run(self):
+        if self._results is None:
+            self._results = self._collection._find(self._query, self._projection, self._sort,
+                                                   self._skip, self._limit)
+        return self._results
+
+    def __iter__(self):
+        return iter(self._run())
+
+    def close(self):
+        pass
+
+
+# ---------------- COLLECTION -----------------
+class MemoryCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._indexes = {'_id_': {'key': {'_id': 1}, 'name': '_id_'}}
+        # unique index name -> {key: _id of the document holding it}
+        self._unique = {}
+
+    @property
+    def _lock(self):
+        return self.database._lock
+
+    def _round_trip(self):
+        self.database.counters['round_trips'] += 1
+
+    # -- reads
+    def _scan(self, query):
+        """Documents matching query, in insertion order. Read-only; callers copy."""
+        query = query or {}
+        if '$text' in query:
+            return [doc for doc in self._text_scores(query['$text']['$search']) if matches(doc, query)]
+        doc_id = query.get('_id')
+        if doc_id is not None and not isinstance(doc_id, dict):
+            doc = self._docs.get(doc_id)
+            self.database.counters['docs_examined'] += doc is not None
+            return [doc] if doc is not None and matches(doc, query) else []
+        self.database.counters['docs_examined'] += len(self._docs)
+        return [doc for doc in self._docs.values() if matches(doc, query)]
+
+    def _text_scores(self, search):
+        """Copies of the documents matching a text search, each with its score."""
+        weights = next((index.get('weights') for index in self._indexes.values() if index.get('weights')), None)
+        if weights is None:
+            raise OperationFailure("text index required for $text query", code=27)
+        terms = set(_WORD.findall(search.lower()))
+        self.database.counters['docs_examined'] += len(self._docs)
+        scored = []
+        for doc in self._docs.values():
+            score = 0.0
+            for field, weight in weights.items():
+                text = doc.get(field)
+                if isinstance(text, str):
+                    score += weight * sum(word in terms for word in _WORD.findall(text.lower()))
+            if score:
+                scored.append({**doc, _SCORE: score})
+        return scored
+
+    def _find(self, query, projection, sort=None, skip=0, limit=0):
+        self._round_trip()
+        with self._lock:
+            docs = self._scan(query)
+            if sort:
+                docs = _sort(docs, sort)
+            if skip:
+                docs = docs[skip:]
+            if limit:
+                docs = docs[:limit]
+            return [_project(doc, projection) for doc in docs]
+
+    def find(self, filter=None, projection=None, **kwargs):
+        cursor = MemoryCursor(self, filter or {}, projection)
+        if kwargs.get('sort'):
+            cursor.sort(kwargs['sort'])
+        return cursor.skip(kwargs.get('skip', 0)).limit(kwargs.get('limit', 0))
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        results = self._find(filter or {}, projection, sort, 0, 1)
+        return results[0] if results else None
+
+    def count_documents(self, filter, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return len(self._scan(filter))
+
+    def estimated_document_count(self, **kwargs):
+        self._round_trip()
+        return len(self._docs)
+
+    def distinct(self, key, filter=None, **kwargs):
+        self._round_trip()
+        with self._lock:
+            values = []
+            for doc in self._scan(filter):
+                value = _get(doc, key)
+                for item in (value if isinstance(value, list) else [value]):
+                    if item is not _MISSING and item not in values:
+                        values.append(_copy(item))
+            return values
+
+    def aggregate(self, pipeline, **kwargs):
+        self._round_trip()
+        with self._lock:
+            first = pipeline[0] if pipeline else {}
+            if '$match' in first:
+                docs, pipeline = self._scan(first['$match']), pipeline[1:]
+            else:
+                self.database.counters['docs_examined'] += len(self._docs)
+                docs = list(self._docs.values())
+            docs = [_copy(doc) for doc in docs]
+            return iter(self.database._run_pipeline(docs, pipeline, self.name))
+
+    # -- unique indexes
+    def _unique_keys(self, doc):
+        """(index name, key) of every unique index entry doc has."""
+        for name in self._unique:
+            index = self._indexes[name]
+            partial = index.get('partialFilterExpression')
+            if partial and not matches(doc, partial):
+                continue
+            yield name, tuple(_hashable(_get(doc, field)) for field in index['key'])
+
+    def _check_unique(self, doc, exclude_id=None):
+        for name, key in self._unique_keys(doc):
+            owner = self._unique[name].get(key, exclude_id)
+            if owner != exclude_id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.database.name}.{self.name} "
+                    f"index: {name} dup key: {key}", code=11000)
+
+    def _index_add(self, doc):
+        for name, key in self._unique_keys(doc):
+            self._unique[name][key] = doc['_id']
+
+    def _index_remove(self, doc):
+        for name, key in self._unique_keys(doc):
+            self._unique[name].pop(key, None)
+
+    def _replace(self, old, new):
+        """Store an updated document, keeping the unique indexes in step."""
+        self._check_unique(new, exclude_id=old['_id'])
+        self._index_remove(old)
+        self._index_add(new)
+        self._docs[old['_id']] = new
+
+    # -- writes
+    def _insert(self, document):
+        doc = _copy(document)
+        if '_id' not in doc:
+            doc['_id'] = ObjectId()
+        # pymongo sets the generated _id on the caller's document too
+        document.setdefault('_id', doc['_id'])
+        if doc['_id'] in self._docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.database.name}.{self.name} index: _id_",
+                code=11000)
+        self._check_unique(doc)
+        self._index_add(doc)
+        self._docs[doc['_id']] = doc
+        return doc['_id']
+
+    def insert_one(self, document, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        """Like pymongo, failed documents are reported in one BulkWriteError."""
+        self._round_trip()
+        inserted = []
+        write_errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document))
+                except DuplicateKeyError as e:
+                    write_errors.append({'index': index, 'code': e.code, 'errmsg': str(e), 'op': document})
+                    if ordered:
+                        break
+        if write_errors:
+            raise BulkWriteError({'writeErrors': write_errors, 'writeConcernErrors': [],
+                                  'nInserted': len(inserted), 'nUpserted': 0, 'nMatched': 0,
+                                  'nModified': 0, 'nRemoved': 0, 'upserted': []})
+        return InsertManyResult(inserted, True)
+
+    def _update(self, filter, update, upsert, many):
+        """Returns (matched, modified, upserted _id or None)."""
+        matched = modified = 0
+        targets = self._scan(filter)
+        if not many:
+            targets = targets[:1]
+        for doc in targets:
+            matched += 1
+            updated = _copy(doc)
+            _apply_update(updated, update)
+            if updated != doc:
+                self._replace(doc, updated)
+                modified += 1
+        if matched or not upsert:
+            return matched, modified, None
+        doc = _upsert_seed(filter)
+        _apply_update(doc, update, inserting=True)
+        return 0, 0, self._insert(doc)
+
+    def _update_result(self, matched, modified, upserted_id):
+        raw = {'n': matched if upserted_id is None else 1, 'nModified': modified}
+        if upserted_id is not None:
+            raw['upserted'] = upserted_id
+        return UpdateResult(raw, True)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return self._update_result(*self._update(filter, update, upsert, many=False))
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return self._update_result(*self._update(filter, update, upsert, many=True))
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return self.update_one(filter, replacement, upsert)
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        self._round_trip()
+        with self._lock:
+            docs = self._scan(filter)
+            if sort:
+                docs = _sort(docs, sort)
+            if not docs:
+                if not upsert:
+                    return None
+                _, _, doc_id = self._update(filter, update, True, many=False)
+                return _project(self._docs[doc_id], projection) if return_document else None
+            before = docs[0]
+            after = _copy(before)
+            _apply_update(after, update)
+            self._replace(before, after)
+            return _project(after if return_document else before, projection)
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        self._round_trip()
+        with self._lock:
+            docs = self._scan(filter)
+            if sort:
+                docs = _sort(docs, sort)
+            if not docs:
+                return None
+            doc = self._docs.pop(docs[0]['_id'])
+            self._index_remove(doc)
+            return _project(doc, projection)
+
+    def _delete(self, filter, many):
+        targets = self._scan(filter)
+        if not many:
+            targets = targets[:1]
+        for doc in targets:
+            self._index_remove(self._docs.pop(doc['_id']))
+        return DeleteResult({'n': len(targets)}, True)
+
+    def delete_one(self, filter, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return self._delete(filter, many=False)
+
+    def delete_many(self, filter, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return self._delete(filter, many=True)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        """UpdateOne/UpdateMany/DeleteOne/DeleteMany/InsertOne requests, as one round trip."""
+        self._round_trip()
+        totals = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0,
+                  'upserted': [], 'writeErrors': [], 'writeConcernErrors': []}
+        with self._lock:
+            for index, request in enumerate(requests):
+                kind = type(request).__name__
+                if kind == 'InsertOne':
+                    self._insert(request._doc)
+                    totals['nInserted'] += 1
+                elif kind in ('UpdateOne', 'UpdateMany', 'ReplaceOne'):
+                    matched, modified, upserted_id = self._update(
+                        request._filter, request._doc, request._upsert, many=kind == 'UpdateMany')
+                    totals['nMatched'] += matched
+                    totals['nModified'] += modified
+                    if upserted_id is not None:
+                        totals['nUpserted'] += 1
+                        totals['upserted'].append({'index': index, '_id': upserted_id})
+                elif kind in ('DeleteOne', 'DeleteMany'):
+                    totals['nRemoved'] += self._delete(request._filter, many=kind == 'DeleteMany').deleted_count
+                else:
+                    raise OperationFailure(f"Unsupported bulk write request: {kind}")
+        return BulkWriteResult(totals, True)
+
+    # -- indexes
+    def create_indexes(self, indexes, **kwargs):
+        self._round_trip()
+        names = []
+        with self._lock:
+            for model in indexes:
+                spec = dict(model.document)
+                key = dict(spec['key'])
+                if any(direction == 'text' for direction in key.values()):
+                    spec['weights'] = spec.get('weights') or {field: 1 for field in key}
+                spec['key'] = key
+                existing = self._indexes.get(spec['name'])
+                if existing is not None and existing != spec:
+                    raise OperationFailure(
+                        f"An existing index has the same name as the requested index: {spec['name']}", code=86)
+                self._indexes[spec['name']] = spec
+                if existing is None and spec.get('unique'):
+                    self._unique[spec['name']] = {}
+                    try:
+                        for doc in self._docs.values():
+                            self._check_unique(doc)
+                            self._index_add(doc)
+                    except DuplicateKeyError:
+                        del self._indexes[spec['name']]
+                        del self._unique[spec['name']]
+                        raise
+                names.append(spec['name'])
+        return names
+
+    def create_index(self, keys, **kwargs):
+        from pymongo import IndexModel
+        return self.create_indexes([IndexModel(keys, **kwargs)])[0]
+
+    def index_information(self):
+        return {name: {'key': list(spec['key'].items()),
+                       **{k: v for k, v in spec.items() if k not in ('key', 'name')}}
+                for name, spec in self._indexes.items()}
+
+    def drop_index(self, name):
+        self._indexes.pop(name, None)
+        self._unique.pop(name, None)
+
+    def drop(self):
+        self.database.drop_collection(self.name)
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+
+# ---------------- DATABASE AND CLIENT -----------------
+class MemoryDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._lock = threading.RLock()
+        self._collections = {}
+        self.counters = {'round_trips': 0, 'docs_examined': 0}
+
+    def __getitem__(self, name):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = MemoryCollection(self, name)
+            return collection
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name, **kwargs):
+        return self[name]
+
+    def create_collection(self, name, **kwargs):
+        """Validators are accepted but not enforced."""
+        return self[name]
+
+    def list_collection_names(self, **kwargs):
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+    def drop_collection(self, name):
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def command(self, command, *args, **kwargs):
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in ('ping', 'collMod', 'buildInfo', 'serverStatus'):
+            return {'ok': 1.0}
+        raise OperationFailure(f"no such command: '{name}'", code=59)
+
+    def reset_counters(self):
+        self.counters = {'round_trips': 0, 'docs_examined': 0}
+
+    # -- aggregation
+    def _run_pipeline(self, docs, pipeline, collection_name):
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == '$match':
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == '$sort':
+                docs = _sort(docs, spec)
+            elif name == '$skip':
+                docs = docs[spec:]
+            elif name == '$limit':
+                docs = docs[:spec]
+            elif name == '$project':
+                docs = [_project(doc, spec) for doc in docs]
+            elif name in ('$addFields', '$set'):
+                for doc in docs:
+                    for path, expr in spec.items():
+                        _set(doc, path, evaluate(doc, expr))
+            elif name == '$lookup':
+                docs = self._lookup(docs, spec)
+            elif name == '$unwind':
+                docs = self._unwind(docs, spec)
+            elif name == '$count':
+                docs = [{spec: len(docs)}] if docs else []
+            elif name == '$facet':
+                docs = [{key: self._run_pipeline([_copy(doc) for doc in docs], sub, collection_name)
+                         for key, sub in spec.items()}]
+            elif name == '$group':
+                docs = self._group(docs, spec)
+            else:
+                raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'", code=40324)
+        return [{key: value for key, value in doc.items() if key != _SCORE} for doc in docs]
+
+    def _lookup(self, docs, spec):
+        foreign = self[spec['from']]
+        self.counters['docs_examined'] += len(foreign._docs)
+        # Hash the foreign collection on foreignField once for the whole stage
+        by_value = {}
+        for other in foreign._docs.values():
+            value = _get(other, spec['foreignField'])
+            for item in (value if isinstance(value, list) else [value]):
+                by_value.setdefault(_hashable(item), []).append(other)
+        for doc in docs:
+            local = _get(doc, spec['localField'])
+            keys = [_hashable(item) for item in local] if isinstance(local, list) else [_hashable(local)]
+            joined = {}
+            for key in keys:
+                for other in by_value.get(key, ()):
+                    joined[other['_id']] = other
+            doc[spec['as']] = [_copy(other) for other in joined.values()]
+        return docs
+
+    @staticmethod
+    def _unwind(docs, spec):
+        if isinstance(spec, str):
+            spec = {'path': spec}
+        path = spec['path'][1:]
+        keep = spec.get('preserveNullAndEmptyArrays', False)
+        unwound = []
+        for doc in docs:
+            value = _get(doc, path)
+            if isinstance(value, list) and value:
+                for item in value:
+                    copy = dict(doc)
+                    _set(copy, path, item)
+                    unwound.append(copy)
+            elif keep:
+                copy = dict(doc)
+                if isinstance(value, list) or value is _MISSING:
+                    _unset(copy, path)
+                unwound.append(copy)
+            elif value is not _MISSING and value is not None and not isinstance(value, list):
+                unwound.append(doc)
+        return unwound
+
+    @staticmethod
+    def _group(docs, spec):
+        groups = {}
+        for doc in docs:
+            key = evaluate(doc, spec['_id'])
+            group_key = repr(key)
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = {'_id': key}
+            for field, accumulator in spec.items():
+                if field == '_id':
+                    continue
+                (op, expr), = accumulator.items()
+                value = evaluate(doc, expr)
+                if op == '$sum':
+                    group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+                elif op == '$push':
+                    group.setdefault(field, []).append(value)
+                elif op == '$first':
+                    group.setdefault(field, value)
+                elif op == '$last':
+                    group[field] = value
+                elif op == '$max':
+                    if field not in group or _compare(value, group[field]) > 0:
+                        group[field] = value
+                elif op == '$min':
+                    if field not in group or _compare(value, group[field]) < 0:
+                        group[field] = value
+                else:
+                    raise OperationFailure(f"unknown group operator '{op}'", code=15952)
+        return list(groups.values())
+
+
+class MemoryClient:
+    """
+    Drop-in for MongoClient. Clients created without a `store` share this
+    process's data, like clients connected to the same server; pass a dict
+    as `store` for an isolated instance. Connection options are accepted
+    and ignored.
+    """
+
+    _shared_store = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, *args, store=None, **options):
+        self._databases = self._shared_store if store is None else store
+        self.admin = MemoryDatabase(self, 'admin')
+
+    def __getitem__(self, name):
+        with self._shared_lock:
+            database = self._databases.get(name)
+            if database is None:
+                database = self._databases[name] = MemoryDatabase(self, name)
+            return database
+
+    def get_database(self, name, **kwargs):
+        return self[name]
+
+    def drop_database(self, name):
+        with self._shared_lock:
+            self._databases.pop(getattr(name, 'name', name), None)
+
+    def list_database_names(self):
+        return list(self._databases)
+
+    def server_info(self):
+        return {'version': 'memory', 'ok': 1.0}
+
+    def close(self):
+        pass
@@ -0,0 +1,300 @@
+"""
+Schema normalization for the College Event Management application.
+
+Older data stores event dates as strings and registration student IDs as
+strings. These migrations rewrite both to their canonical BSON types
+(datetime and ObjectId) in batches, backfill the event time window that
+the schedule-conflict check reads from each registration, backfill the
+counters and search keywords added since, and install collection
+validators that keep new writes canonical.
+
+Progress is checkpointed in the `migrations` collection, so an
+interrupted run resumes after the last completed batch. Documents whose
+date or student ID cannot be converted are moved to
+`<collection>_quarantine` (counted as failed), so the app never reads a
+non-canonical value; fix them there and insert them back.
+"""
+
+import logging
+from datetime import datetime
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import DeleteOne, UpdateOne
+from scheduling import registration_window
+from search import title_keywords
+
+DEFAULT_BATCH_SIZE = 500
+
+# Formats event dates have historically been stored in
+EVENT_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+VALIDATORS = {
+    "events": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ["title", "date"],
+            "properties": {
+                "title": {"bsonType": "string"},
+                "date": {"bsonType": "date"},
+            },
+        }
+    },
+    "registrations": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ["event_id", "student_id", "status"],
+            "properties": {
+                "event_id": {"bsonType": "objectId"},
+                "student_id": {"bsonType": "objectId"},
+                "status": {"bsonType": "string"},
+            },
+        }
+    },
+}
+
+
+def parse_event_date(value):
+    """Parse a legacy string event date. Returns a datetime or None."""
+    for fmt in EVENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_student_id(value):
+    """Convert a legacy string student ID. Returns an ObjectId or None."""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def _run_migration(db, name, collection_name, query, projection, build_operations, batch_size, restart):
+    """
+    Scan documents matching `query` in _id order, one batch at a time.
+    `build_operations(batch)` returns (bulk write operations, failed count).
+    The last processed _id is checkpointed after each batch.
+    """
+    checkpoints = db.migrations
+    if restart:
+        checkpoints.delete_one({"_id": name})
+    checkpoint = checkpoints.find_one({"_id": name}) or {}
+
+    query = dict(query)
+    if checkpoint.get("last_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+
+    converted = checkpoint.get("converted", 0)
+    failed = checkpoint.get("failed", 0)
+    collection = db[collection_name]
+
+    while True:
+        batch = list(collection.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations, batch_failed = build_operations(batch)
+        failed += batch_failed
+        if operations:
+            converted += collection.bulk_write(operations, ordered=False).modified_count
+
+        last_id = batch[-1]["_id"]
+        query["_id"] = {"$gt": last_id}
+        checkpoints.update_one(
+            {"_id": name},
+            {"$set": {"last_id": last_id, "converted": converted, "failed": failed,
+                      "updated_at": datetime.now()}},
+            upsert=True
+        )
+
+    checkpoints.update_one({"_id": name}, {"$set": {"completed_at": datetime.now()}}, upsert=True)
+    logging.info(f"{name}: converted {converted}, failed {failed}")
+    return {"converted": converted, "failed": failed}
+
+
+def _convert_field(db, name, collection_name, field, convert):
+    """
+    build_operations for a migration that rewrites one field with `convert`.
+    Documents it cannot convert are copied to `<collection>_quarantine` and
+    removed from the collection.
+    """
+    quarantine = db[f"{collection_name}_quarantine"]
+
+    def build_operations(batch):
+        operations = []
+        unconvertible = {}
+        for doc in batch:
+            new_value = convert(doc[field])
+            if new_value is None:
+                unconvertible[doc["_id"]] = doc[field]
+                continue
+            # Match the old value too, so a concurrent edit is never overwritten
+            operations.append(UpdateOne({"_id": doc["_id"], field: doc[field]},
+                                        {"$set": {field: new_value}}))
+
+        if unconvertible:
+            for doc in db[collection_name].find({"_id": {"$in": list(unconvertible)}}):
+                logging.warning(f"{name}: cannot convert {field}={doc[field]!r} on {doc['_id']}, "
+                                f"moved to {quarantine.name}")
+                quarantine.replace_one({"_id": doc["_id"]},
+                                       {**doc, "quarantined_by": name, "quarantined_at": datetime.now()},
+                                       upsert=True)
+                operations.append(DeleteOne({"_id": doc["_id"], field: unconvertible[doc["_id"]]}))
+        return operations, len(unconvertible)
+    return build_operations
+
+
+def migrate_event_dates(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """Convert string events.date values to datetime, quarantining unparseable ones."""
+    return _run_migration(db, "event_dates", "events", {"date": {"$type": "string"}}, {"date": 1},
+                          _convert_field(db, "event_dates", "events", "date", parse_event_date),
+                          batch_size, restart)
+
+
+def migrate_student_ids(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """Convert string registrations.student_id values to ObjectId, quarantining invalid ones."""
+    return _run_migration(db, "student_ids", "registrations", {"student_id": {"$type": "string"}}, {"student_id": 1},
+                          _convert_field(db, "student_ids", "registrations", "student_id", parse_student_id),
+                          batch_size, restart)
+
+
+def backfill_registration_windows(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    Copy each event's time window onto registrations created before the
+    conflict check used it. Events are fetched with one $in query per batch.
+    """
+    def build_operations(batch):
+        event_ids = list({doc["event_id"] for doc in batch})
+        events = {event["_id"]: event for event in
+                  db.events.find({"_id": {"$in": event_ids}}, {"date": 1, "duration_minutes": 1})}
+        operations = []
+        failed = 0
+        for doc in batch:
+            event = events.get(doc["event_id"])
+            if event is None or not isinstance(event.get("date"), datetime):
+                failed += 1
+                continue
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": registration_window(event)}))
+        return operations, failed
+
+    return _run_migration(db, "registration_windows", "registrations", {"event_start": {"$exists": False}},
+                          {"event_id": 1}, build_operations, batch_size, restart)
+
+
+def backfill_seat_counters(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    Set events.seats_taken from the number of active registrations for events
+    created before seat counting. One aggregation per batch of events.
+    """
+    def build_operations(batch):
+        event_ids = [event["_id"] for event in batch]
+        counts = {row["_id"]: row["count"] for row in db.registrations.aggregate([
+            {"$match": {"event_id": {"$in": event_ids}, "status": "active"}},
+            {"$group": {"_id": "$event_id", "count": {"$sum": 1}}}
+        ])}
+        operations = [UpdateOne({"_id": event_id, "seats_taken": {"$exists": False}},
+                                {"$set": {"seats_taken": counts.get(event_id, 0)}})
+                      for event_id in event_ids]
+        return operations, 0
+
+    return _run_migration(db, "seat_counters", "events", {"seats_taken": {"$exists": False}},
+                          {"_id": 1}, build_operations, batch_size, restart)
+
+
+def recount_unread_counters(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    Set every user's unread_notifications to their actual number of unread
+    notifications. "converted" counts the counters that were wrong.
+
+    The counter is updated by a separate write after each notification
+    insert or read, so it is only eventually consistent: a failed $inc, or
+    a legacy user notified before this migration first ran, leaves it off.
+    This recounts all users, not just those without a counter, and can be
+    re-run at any time with 'flask recount-unread'.
+    """
+    def build_operations(batch):
+        user_ids = [user["_id"] for user in batch]
+        counts = {row["_id"]: row["count"] for row in db.notifications.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}, "is_read": False}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+        ])}
+        operations = [UpdateOne({"_id": user_id}, {"$set": {"unread_notifications": counts.get(user_id, 0)}})
+                      for user_id in user_ids]
+        return operations, 0
+
+    # Checkpointed under a new name so databases migrated by the earlier
+    # exists-only backfill are recounted once
+    return _run_migration(db, "unread_recount", "users", {}, {"_id": 1}, build_operations, batch_size, restart)
+
+
+def backfill_title_keywords(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """Store the autocomplete words of each event title created before search existed."""
+    def build_operations(batch):
+        operations = [UpdateOne({"_id": event["_id"], "title": event["title"]},
+                                {"$set": {"title_keywords": title_keywords(event["title"])}})
+                      for event in batch]
+        return operations, 0
+
+    return _run_migration(db, "title_keywords", "events", {"title_keywords": {"$exists": False}},
+                          {"title": 1}, build_operations, batch_size, restart)
+
+
+def cancel_duplicate_registrations(db):
+    """
+    Keep only the earliest active registration per (student_id, event_id)
+    and cancel the rest, so the unique partial index can be built.
+    """
+    duplicates = db.registrations.aggregate([
+        {"$match": {"status": "active"}},
+        {"$sort": {"registered_at": 1, "_id": 1}},
+        {"$group": {"_id": {"student_id": "$student_id", "event_id": "$event_id"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+    cancelled = 0
+    for group in duplicates:
+        result = db.registrations.update_many(
+            {"_id": {"$in": group["ids"][1:]}},
+            {"$set": {"status": "cancelled"}}
+        )
+        cancelled += result.modified_count
+    logging.info(f"duplicate_registrations: cancelled {cancelled}")
+    return {"converted": cancelled, "failed": 0}
+
+
+def apply_validators(db):
+    """
+    Install the $jsonSchema validators. validationLevel "moderate" means
+    documents that are still non-canonical can be updated, but every insert
+    and every update of a valid document must match the schema.
+    """
+    existing = set(db.list_collection_names())
+    for collection_name, validator in VALIDATORS.items():
+        if collection_name in existing:
+            db.command("collMod", collection_name, validator=validator,
+                       validationLevel="moderate", validationAction="error")
+        else:
+            db.create_collection(collection_name, validator=validator,
+                                 validationLevel="moderate", validationAction="error")
+        logging.info(f"Validator applied to {collection_name}")
+
+
+def migrate_schema(db, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """Run every migration, then install the validators."""
+    results = {
+        "event_dates": migrate_event_dates(db, batch_size, restart),
+        "student_ids": migrate_student_ids(db, batch_size, restart),
+        # Needs canonical event dates, so it runs after event_dates
+        "registration_windows": backfill_registration_windows(db, batch_size, restart),
+        # Needs canonical student IDs so string and ObjectId duplicates are grouped together
+        "duplicate_registrations": cancel_duplicate_registrations(db),
+        # Counts active registrations, so it runs after duplicates are cancelled
+        "seat_counters": backfill_seat_counters(db, batch_size, restart),
+        "unread_counters": recount_unread_counters(db, batch_size, restart),
+        "title_keywords": backfill_title_keywords(db, batch_size, restart),
+    }
+    apply_validators(db)
+    return results
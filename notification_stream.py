@@ -0,0 +1,182 @@
+"""
+Live notification delivery for the College Event Management application.
+
+Each process keeps one NotificationBroker. Open Server-Sent Events
+streams subscribe to it by user ID, and new notifications are published
+to those subscribers in one of two ways:
+
+* change streams: one watcher thread per process tails inserts on the
+  `notifications` collection, so a notification written by any worker
+  reaches streams held by every worker. Needs a replica set or Atlas.
+* local: if change streams are unavailable (a standalone mongod), the
+  process that writes a notification publishes it directly. Streams then
+  only see notifications written by their own worker; the page's unread
+  count and feed still catch up on the next load.
+
+Every subscriber has a small bounded queue. A subscriber that falls
+behind is not allowed to grow memory: it is marked as overflowed and its
+stream tells the browser to resync instead.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from pymongo.errors import OperationFailure, PyMongoError
+from database import env_int
+
+def _default_max_streams():
+    # Under gevent a stream is a cheap greenlet. Under gthread each one holds
+    # a worker thread, so at least half of them are kept for normal requests.
+    if os.environ.get('GUNICORN_WORKER_CLASS', 'gthread') == 'gevent':
+        return 1000
+    return max(1, env_int('GUNICORN_THREADS', 4) // 2)
+
+
+STREAM_QUEUE_SIZE = env_int('NOTIFICATION_STREAM_QUEUE_SIZE', 100)
+# Open streams allowed per process
+MAX_STREAMS = env_int('NOTIFICATION_MAX_STREAMS', _default_max_streams())
+HEARTBEAT_SECONDS = env_int('NOTIFICATION_HEARTBEAT_SECONDS', 15)
+# Streams are closed after this long; EventSource reconnects by itself
+STREAM_LIFETIME_SECONDS = env_int('NOTIFICATION_STREAM_LIFETIME_SECONDS', 300)
+WATCH_RETRY_SECONDS = 5
+
+
+class Subscription:
+    """One open stream's queue of notifications."""
+
+    def __init__(self, user_id, maxsize=STREAM_QUEUE_SIZE):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, notification):
+        try:
+            self.queue.put_nowait(notification)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next notification, or None after `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class NotificationBroker:
+    """Per-process fan-out of new notifications to open streams."""
+
+    CHANGE_STREAM = 'change_stream'
+    LOCAL = 'local'
+
+    def __init__(self, get_database, max_streams=MAX_STREAMS):
+        self._get_database = get_database
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._count = 0
+        self._mode = None
+        self._watcher = None
+        self._pid = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset_after_fork)
+
+    def reset_after_fork(self):
+        """Forget the parent's subscribers and watcher thread in a forked child."""
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._count = 0
+        self._mode = None
+        self._watcher = None
+        self._pid = None
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def subscribe(self, user_id):
+        """Register a stream for user_id. Returns a Subscription, or None when at MAX_STREAMS."""
+        self._ensure_watching()
+        with self._lock:
+            if self._count >= self.max_streams:
+                return None
+            subscription = Subscription(user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def _publish(self, notification):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(notification['user_id']), ()))
+        for subscription in subscribers:
+            subscription.offer(notification)
+
+    def publish_local(self, notification):
+        """
+        Called after a notification is stored. Does nothing while the change
+        stream is delivering, so nothing is sent twice.
+        """
+        if self._mode != self.CHANGE_STREAM:
+            self._publish(notification)
+
+    def _ensure_watching(self):
+        """Start this process's change stream watcher on the first subscription."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._mode = self.LOCAL
+            self._watcher = threading.Thread(target=self._watch, name="notification-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        """Tail notification inserts, resuming after errors. Falls back to local mode if unsupported."""
+        resume_token = None
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            db = self._get_database()
+            if db is None:
+                time.sleep(WATCH_RETRY_SECONDS)
+                continue
+            try:
+                with db.notifications.watch(pipeline, resume_after=resume_token) as stream:
+                    if self._mode != self.CHANGE_STREAM:
+                        logging.info("Notification streams fed by MongoDB change streams")
+                    self._mode = self.CHANGE_STREAM
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        self._publish(change["fullDocument"])
+            except OperationFailure as e:
+                if e.code == 40573:
+                    # "The $changeStream stage is only supported on replica sets"
+                    logging.info("Change streams unavailable; notification streams use local delivery")
+                    self._mode = self.LOCAL
+                    return
+                logging.warning(f"Notification change stream error: {e}")
+                resume_token = None
+            except PyMongoError as e:
+                logging.warning(f"Notification change stream interrupted: {e}")
+            self._mode = self.LOCAL
+            time.sleep(WATCH_RETRY_SECONDS)
+
+    def stats(self):
+        """Broker statistics for monitoring."""
+        with self._lock:
+            return {
+                'mode': self._mode,
+                'open_streams': self._count,
+                'max_streams': self.max_streams,
+            }
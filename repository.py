@@ -0,0 +1,541 @@
+"""
+Read queries for the College Event Management application.
+
+Each page reads only the fields it shows. The projections for those
+reads are defined here next to the queries. Results come back as small
+record classes with __slots__ instead of full documents or per-route
+dicts: no `password` or `reset_token` leaves the database for a page
+that only needs a name, and each row costs one fixed-size object.
+Templates read records the same way as dicts (`event.title`), and the
+JSON provider in api_support.py serializes them with as_dict().
+
+Writes that must happen in a particular order (seat reservation,
+waitlist promotion, notification fan-out) stay with their workflows in
+app.py.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+# ---------------- PROJECTIONS -----------------
+LOGIN_FIELDS = {"name": 1, "role": 1, "email": 1}
+# Event documents as cached by app.get_event; counters that change on every
+# registration are left out so a cached copy never shows a stale seat count
+EVENT_CACHE_EXCLUDED_FIELDS = {"seats_taken": 0, "waitlist_seq": 0}
+# What edit_event.html shows and describe_event_changes compares
+EVENT_EDIT_FIELDS = {"title": 1, "description": 1, "date": 1, "location": 1,
+                     "duration_minutes": 1, "capacity": 1, "seats_taken": 1}
+# Only the fields events.html and the dashboard display
+EVENT_LIST_FIELDS = {"title": 1, "description": 1, "date": 1, "location": 1}
+NOTIFICATION_FIELDS = {"title": 1, "message": 1, "type": 1, "is_read": 1, "created_at": 1, "related_url": 1}
+# my_registrations.html truncates descriptions to 70 characters (plus Jinja's leeway)
+MY_REGISTRATIONS_DESCRIPTION_CHARS = 80
+
+REGISTRATION_SORTS = {
+    'newest': {"registered_at": -1, "_id": -1},
+    'oldest': {"registered_at": 1, "_id": 1},
+    'name': {"student.name": 1, "_id": 1}
+}
+
+
+# ---------------- RECORDS -----------------
+class Record:
+    """Base for the fixed-field rows returned by this module."""
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class SessionUser(Record):
+    __slots__ = ('id', 'name', 'role', 'email')
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(id=str(doc['_id']), name=doc['name'], role=doc['role'], email=doc.get('email'))
+
+
+class EventListing(Record):
+    """A row of the events listing and search results."""
+
+    __slots__ = ('id', 'title', 'description', 'date', 'location', 'is_past')
+
+    @classmethod
+    def from_document(cls, doc, today_start):
+        return cls(
+            id=str(doc['_id']),
+            title=doc.get('title', ''),
+            description=doc.get('description', ''),
+            date=doc['date'],
+            location=doc.get('location', ''),
+            is_past=doc['date'] < today_start
+        )
+
+
+class UpcomingEvent(Record):
+    """An event in the dashboard's upcoming events panel."""
+
+    __slots__ = ('id', 'title', 'date', 'location', 'description', 'days_remaining', 'is_today', 'is_tomorrow')
+
+    @classmethod
+    def from_document(cls, doc, today):
+        days_remaining = (doc['date'].date() - today).days
+        return cls(
+            id=str(doc['_id']),
+            title=doc['title'],
+            date=doc['date'],
+            location=doc.get('location', 'TBA'),
+            description=doc.get('description', ''),
+            days_remaining=days_remaining,
+            is_today=days_remaining == 0,
+            is_tomorrow=days_remaining == 1
+        )
+
+
+class Notification(Record):
+    """A notification as shown on the notifications page, the feed and the stream."""
+
+    __slots__ = ('id', 'title', 'message', 'type', 'is_read', 'created_at', 'related_url')
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(
+            id=str(doc['_id']),
+            title=doc.get('title', 'Notification'),
+            message=doc.get('message', ''),
+            type=doc.get('type', 'info'),
+            is_read=doc.get('is_read', False),
+            created_at=doc.get('created_at', datetime.now()),
+            related_url=doc.get('related_url')
+        )
+
+
+class EventRegistrant(Record):
+    """A row of view_registrations.html."""
+
+    __slots__ = ('id', 'student_name', 'phone', 'comments')
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(
+            id=str(doc['_id']),
+            student_name=doc.get('student_name') or 'Unknown Student',
+            phone=doc.get('phone', 'N/A'),
+            comments=doc.get('comments', 'None')
+        )
+
+
+class RegistrationRow(Record):
+    """A row of the admin's all_registrations.html."""
+
+    __slots__ = ('id', 'event_name', 'student_name', 'email', 'phone', 'comments', 'registered_at', 'status')
+
+    @classmethod
+    def from_document(cls, doc):
+        registered_at = doc.get('registered_at')
+        return cls(
+            id=str(doc['_id']),
+            event_name=doc.get('event_name', 'Unknown Event'),
+            student_name=doc.get('student_name', 'Unknown Student'),
+            email=doc.get('email', 'N/A'),
+            phone=doc.get('phone', 'N/A'),
+            comments=doc.get('comments', ''),
+            registered_at=registered_at.strftime('%Y-%m-%d %H:%M:%S') if isinstance(registered_at, datetime) else '',
+            status=doc.get('status', 'active')
+        )
+
+
+class EventSummary(Record):
+    __slots__ = ('id', 'title', 'date', 'location', 'description')
+
+
+class StudentRegistration(Record):
+    """A row of my_registrations.html: the registration and its event."""
+
+    __slots__ = ('id', 'status', 'event')
+
+    @classmethod
+    def from_document(cls, doc):
+        event = doc['event']
+        return cls(
+            id=str(doc['_id']),
+            status=doc.get('status', 'active'),
+            event=EventSummary(
+                id=str(event['_id']),
+                title=event.get('title', ''),
+                date=event.get('date'),
+                location=event.get('location', ''),
+                description=event.get('description', '')
+            )
+        )
+
+
+# ---------------- PAGINATION -----------------
+def encode_cursor(sort_value, doc_id):
+    """Encode the (sort value, _id) of the last row of a page as a cursor string"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return f"{sort_value}|{doc_id}"
+
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor. Returns (datetime, ObjectId) or None"""
+    if not cursor:
+        return None
+    try:
+        sort_value, doc_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(sort_value), ObjectId(doc_id)
+    except (ValueError, InvalidId):
+        logging.warning(f"Ignoring malformed pagination cursor: {cursor}")
+        return None
+
+
+def keyset_condition(field, cursor, descending=True):
+    """Build the query that continues a (field, _id) sorted listing after cursor"""
+    value, last_id = cursor
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: last_id}}
+    ]}
+
+
+def _after_cursor(match, field, cursor, descending=True):
+    if not cursor:
+        return match
+    condition = keyset_condition(field, cursor, descending)
+    return {"$and": [match, condition]} if match else condition
+
+
+def student_lookup_stages(keep_missing=False):
+    """
+    Aggregation stages that join a registration to its user document as
+    `student`. student_id is always an ObjectId (see migrations.py).
+    """
+    return [
+        {"$lookup": {
+            "from": "users",
+            "localField": "student_id",
+            "foreignField": "_id",
+            "as": "student"
+        }},
+        {"$unwind": {"path": "$student", "preserveNullAndEmptyArrays": keep_missing}}
+    ]
+
+
+# ---------------- USERS -----------------
+def find_login_user(db_conn, email, password):
+    """The SessionUser with these credentials, or None"""
+    user = db_conn.users.find_one({"email": email, "password": password}, LOGIN_FIELDS)
+    return SessionUser.from_document(user) if user else None
+
+
+def email_registered(db_conn, email):
+    return db_conn.users.find_one({"email": email}, {"_id": 1}) is not None
+
+
+def find_reset_user_id(db_conn, token, now):
+    """_id of the user holding an unexpired reset token, or None"""
+    user = db_conn.users.find_one({"reset_token": token, "reset_token_expiry": {"$gt": now}}, {"_id": 1})
+    return user['_id'] if user else None
+
+
+def unread_notification_count(db_conn, user_id):
+    """The unread counter kept on the user document"""
+    user = db_conn.users.find_one({"_id": user_id}, {"unread_notifications": 1, "_id": 0})
+    return max(0, user.get('unread_notifications', 0)) if user else 0
+
+
+# ---------------- EVENTS -----------------
+def load_event(db_conn, event_id):
+    """An event document without its counters, as cached by app.get_event"""
+    return db_conn.events.find_one({"_id": event_id}, EVENT_CACHE_EXCLUDED_FIELDS)
+
+
+def load_event_for_edit(db_conn, event_id):
+    """The editable fields of an event and its seat count, read past the cache"""
+    return db_conn.events.find_one({"_id": event_id}, EVENT_EDIT_FIELDS)
+
+
+def event_title(db_conn, event_id):
+    """An event's title, or None if it does not exist"""
+    event = db_conn.events.find_one({"_id": event_id}, {"title": 1, "_id": 0})
+    return event["title"] if event else None
+
+
+def events_version(db_conn):
+    """Return (version, updated_at) of the events collection; (0, None) before the first change"""
+    stamp = db_conn.versions.find_one({"_id": "events"}, {"version": 1, "updated_at": 1, "_id": 0}) or {}
+    return stamp.get("version", 0), stamp.get("updated_at")
+
+
+def seats_taken(db_conn, event_id):
+    counter = db_conn.events.find_one({"_id": event_id}, {"seats_taken": 1, "_id": 0})
+    return counter.get("seats_taken", 0) if counter else 0
+
+
+def event_exists(db_conn, title, date, location):
+    """True if an event with this title, date and location is already scheduled"""
+    return db_conn.events.find_one({"title": title, "date": date, "location": location}, {"_id": 1}) is not None
+
+
+def find_events_page(db_conn, filters, cursor, per_page, projection, today_start):
+    """
+    One keyset page of the events listing. filters holds when/location/
+    date_from/date_to (dates already checked by app.valid_date_filters).
+    Returns (event documents with `projection` plus `date`, next_cursor or None).
+    """
+    date_range = {}
+    if filters['when'] == 'upcoming':
+        date_range['$gte'] = today_start
+    elif filters['when'] == 'past':
+        date_range['$lt'] = today_start
+    if filters['date_from']:
+        date_from = datetime.strptime(filters['date_from'], '%Y-%m-%d')
+        date_range['$gte'] = max(date_from, date_range.get('$gte', date_from))
+    if filters['date_to']:
+        date_to = datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1)
+        date_range['$lt'] = min(date_to, date_range.get('$lt', date_to))
+
+    # Past events are listed most recent first, everything else soonest first
+    descending = filters['when'] == 'past'
+    match = {}
+    if date_range:
+        match['date'] = date_range
+    if filters['location']:
+        match['location'] = filters['location']
+    match = _after_cursor(match, 'date', cursor, descending)
+
+    direction = -1 if descending else 1
+    events = list(db_conn.events.find(match, {**projection, "date": 1})
+                  .sort([("date", direction), ("_id", direction)])
+                  .limit(per_page + 1))
+    next_cursor = None
+    if len(events) > per_page:
+        events = events[:per_page]
+        next_cursor = encode_cursor(events[-1]['date'], events[-1]['_id'])
+    return events, next_cursor
+
+
+def event_listing_page(db_conn, filters, cursor, per_page, today_start):
+    """find_events_page as EventListing records for events.html"""
+    events, next_cursor = find_events_page(db_conn, filters, cursor, per_page, EVENT_LIST_FIELDS, today_start)
+    return [EventListing.from_document(event, today_start) for event in events], next_cursor
+
+
+def event_locations(db_conn):
+    """Distinct event locations, served from the location index without reading events"""
+    return sorted(location for location in db_conn.events.distinct("location") if location)
+
+
+def upcoming_events(db_conn, now, days=30, limit=5):
+    """The next `limit` events in the coming `days` days"""
+    rows = db_conn.events.find(
+        {"date": {"$gte": now, "$lte": now + timedelta(days=days)}}, EVENT_LIST_FIELDS
+    ).sort("date", 1).limit(limit)
+    today = now.date()
+    return [UpcomingEvent.from_document(row, today) for row in rows]
+
+
+# ---------------- NOTIFICATIONS -----------------
+def find_notifications(db_conn, user_id, limit, unread_only=False, cursor=None):
+    """A user's notifications, newest first, optionally continuing after a keyset cursor"""
+    query = {"user_id": user_id}
+    if unread_only:
+        query["is_read"] = False
+    query = _after_cursor(query, 'created_at', cursor)
+    rows = (db_conn.notifications.find(query, NOTIFICATION_FIELDS)
+            .sort([("created_at", -1), ("_id", -1)])
+            .limit(limit))
+    return [Notification.from_document(row) for row in rows]
+
+
+def find_notifications_since(db_conn, user_id, last_id, limit):
+    """A user's notifications created after the one with _id last_id, oldest first"""
+    rows = db_conn.notifications.find(
+        {"user_id": user_id, "_id": {"$gt": last_id}}, NOTIFICATION_FIELDS
+    ).sort("_id", 1).limit(limit)
+    return [Notification.from_document(row) for row in rows]
+
+
+# ---------------- REGISTRATIONS -----------------
+def active_registration(db_conn, student_id, event_id):
+    """The _id of the student's active registration for an event, or None"""
+    return db_conn.registrations.find_one(
+        {"student_id": student_id, "event_id": event_id, "status": "active"},
+        {"_id": 1}
+    )
+
+
+def first_waitlisted(db_conn, event_id):
+    """The _id of the registration at the head of an event's waitlist, or None"""
+    return db_conn.registrations.find_one(
+        {"event_id": event_id, "status": "waitlisted"},
+        {"_id": 1},
+        sort=[("waitlist_position", 1)]
+    )
+
+
+def registrant_ids(db_conn, event_id, statuses, batch_size):
+    """Stream the IDs of students registered for an event with one of `statuses`"""
+    registrations = db_conn.registrations.find(
+        {"event_id": event_id, "status": {"$in": list(statuses)}},
+        {"student_id": 1, "_id": 0}
+    ).batch_size(batch_size)
+    for registration in registrations:
+        yield registration["student_id"]
+
+
+def event_registrants_page(db_conn, event_id, sort, page, per_page):
+    """
+    One page of an event's registrations with their students' names.
+    The page and the total/active counts come back together from one
+    $facet round trip. Returns (EventRegistrant list, total, active).
+    """
+    page_stages = [
+        {"$sort": REGISTRATION_SORTS[sort]},
+        {"$skip": (page - 1) * per_page},
+        {"$limit": per_page},
+        *student_lookup_stages(keep_missing=True)
+    ]
+    if sort == 'name':
+        # Sorting by name needs the joined student first
+        page_stages = [
+            *student_lookup_stages(keep_missing=True),
+            {"$sort": REGISTRATION_SORTS[sort]},
+            {"$skip": (page - 1) * per_page},
+            {"$limit": per_page}
+        ]
+    page_stages.append({"$project": {
+        "student_name": "$student.name",
+        "phone": 1,
+        "comments": 1
+    }})
+
+    result = list(db_conn.registrations.aggregate([
+        {"$match": {"event_id": event_id}},
+        {"$facet": {
+            "rows": page_stages,
+            "total": [{"$count": "n"}],
+            "active": [{"$match": {"status": "active"}}, {"$count": "n"}]
+        }}
+    ]))
+    facet = result[0] if result else {}
+    total = facet['total'][0]['n'] if facet.get('total') else 0
+    active = facet['active'][0]['n'] if facet.get('active') else 0
+    return [EventRegistrant.from_document(row) for row in facet.get('rows', [])], total, active
+
+
+def student_registrations(db_conn, student_id):
+    """
+    A student's registrations joined to their events in the same query,
+    soonest event first, keeping only what my_registrations.html shows.
+    """
+    rows = db_conn.registrations.aggregate([
+        {"$match": {"student_id": student_id}},
+        {"$lookup": {
+            "from": "events",
+            "localField": "event_id",
+            "foreignField": "_id",
+            "as": "event"
+        }},
+        {"$unwind": "$event"},
+        {"$sort": {"event.date": 1, "_id": 1}},
+        {"$project": {
+            "status": 1,
+            "event._id": 1,
+            "event.title": 1,
+            "event.date": 1,
+            "event.location": 1,
+            "event.description": {"$substrCP": [{"$ifNull": ["$event.description", ""]}, 0, MY_REGISTRATIONS_DESCRIPTION_CHARS]}
+        }}
+    ])
+    return [StudentRegistration.from_document(row) for row in rows]
+
+
+def student_registrations_page(db_conn, student_id, status, cursor, per_page, projection, with_event):
+    """
+    One keyset page of a student's registrations, newest first, as
+    documents with `projection` for the JSON API. with_event embeds the
+    event's title, date and location as `event`.
+    Returns (documents, next_cursor or None).
+    """
+    match = {"student_id": student_id}
+    if status:
+        match['status'] = status
+    pipeline = [
+        {"$match": _after_cursor(match, 'registered_at', cursor)},
+        {"$sort": {"registered_at": -1, "_id": -1}},
+        {"$limit": per_page + 1},
+    ]
+    fields = dict(projection)
+    fields['registered_at'] = 1
+    if with_event:
+        # Joined after $limit, so only this page's events are looked up
+        pipeline += [
+            {"$lookup": {"from": "events", "localField": "event_id", "foreignField": "_id", "as": "event"}},
+            {"$addFields": {"event": {"$arrayElemAt": ["$event", 0]}}},
+        ]
+        fields.update({"event.title": 1, "event.date": 1, "event.location": 1})
+    pipeline.append({"$project": fields})
+
+    rows = list(db_conn.registrations.aggregate(pipeline))
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].get('registered_at'), rows[-1]['_id'])
+    return rows, next_cursor
+
+
+def registrations_page(db_conn, match, cursor, per_page):
+    """
+    One keyset page of all registrations matching `match`, newest first,
+    for the admin listing. Event and student are joined in the same
+    aggregation; rows whose event or student is gone show as unknown.
+    Returns (RegistrationRow list, next_cursor or None).
+    """
+    # The page is cut before the joins, so only its rows are looked up and
+    # the $match + $sort runs on one of the registered_at indexes. Fetching
+    # one extra row tells us if there is more.
+    pipeline = [
+        {"$match": _after_cursor(match, 'registered_at', cursor)},
+        {"$sort": {"registered_at": -1, "_id": -1}},
+        {"$limit": per_page + 1},
+        {"$lookup": {
+            "from": "events",
+            "localField": "event_id",
+            "foreignField": "_id",
+            "as": "event"
+        }},
+        {"$unwind": {"path": "$event", "preserveNullAndEmptyArrays": True}},
+        *student_lookup_stages(keep_missing=True),
+        {"$project": {
+            "event_name": "$event.title",
+            "student_name": "$student.name",
+            "email": "$student.email",
+            "phone": 1,
+            "comments": 1,
+            "registered_at": 1,
+            "status": 1
+        }}
+    ]
+    rows = list(db_conn.registrations.aggregate(pipeline))
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].get('registered_at'), rows[-1]['_id'])
+    return [RegistrationRow.from_document(row) for row in rows], next_cursor
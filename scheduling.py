@@ -0,0 +1,55 @@
+"""
+Schedule-conflict detection for event registrations.
+
+Each active registration stores the time window of its event
+(`event_start`, `event_end`), so checking a student for conflicts is a
+single range query on the (student_id, status, event_start) index instead
+of loading every registration and event the student has.
+"""
+
+from datetime import timedelta
+
+DEFAULT_DURATION_MINUTES = 60
+MAX_DURATION_MINUTES = 72 * 60
+# Travel/setup time kept free before and after every event
+CONFLICT_BUFFER = timedelta(hours=1)
+# Event fields event_window() reads, for projections
+WINDOW_FIELDS = {"date": 1, "duration_minutes": 1}
+
+
+def event_duration_minutes(event):
+    """Duration of an event in minutes, defaulted and clamped to the supported range."""
+    minutes = event.get('duration_minutes') or DEFAULT_DURATION_MINUTES
+    return max(1, min(int(minutes), MAX_DURATION_MINUTES))
+
+
+def event_window(event):
+    """Return (start, end) datetimes for an event. Events may run past midnight."""
+    start = event['date']
+    return start, start + timedelta(minutes=event_duration_minutes(event))
+
+
+def registration_window(event):
+    """Fields stored on a registration describing when it occupies the student."""
+    start, end = event_window(event)
+    return {"event_start": start, "event_end": end}
+
+
+def find_conflict(db_conn, student_id, event):
+    """
+    Return the student's active registration that overlaps `event`
+    (including the buffer on both sides), or None.
+    """
+    start, end = event_window(event)
+    # Two buffered windows overlap when other_start < end + 2*buffer and
+    # other_end > start - 2*buffer. Since no event is longer than
+    # MAX_DURATION_MINUTES, the event_start range is bounded on both sides
+    # and the index scan stays inside the candidate window.
+    earliest_start = start - 2 * CONFLICT_BUFFER - timedelta(minutes=MAX_DURATION_MINUTES)
+    return db_conn.registrations.find_one({
+        "student_id": student_id,
+        "status": "active",
+        "event_start": {"$gt": earliest_start, "$lt": end + 2 * CONFLICT_BUFFER},
+        "event_end": {"$gt": start - 2 * CONFLICT_BUFFER},
+        "event_id": {"$ne": event['_id']}
+    }, {"event_id": 1, "event_start": 1})
@@ -0,0 +1,86 @@
+"""
+Event search for the College Event Management application.
+
+Full-text search uses the MongoDB text index on title, description and
+location (see indexes.py), ranked by text score with title matches
+weighted highest. Autocomplete cannot use the text index, which only
+matches whole stemmed words, so each event also stores `title_keywords`:
+the lower-cased words of its title. A prefix match on that multikey
+index is an index range scan.
+"""
+
+import re
+
+SEARCH_PAGE_SIZE = 20
+# Text search sorts all matches by score before skipping, so deep pages are capped
+MAX_SEARCH_PAGE = 50
+AUTOCOMPLETE_LIMIT = 8
+# Field weights for the event_text index
+TEXT_WEIGHTS = {"title": 10, "location": 3, "description": 1}
+
+_WORD = re.compile(r"\w+")
+
+
+def title_keywords(title):
+    """Lower-cased distinct words of a title, stored on the event for autocomplete."""
+    return sorted(set(_WORD.findall((title or '').lower())))
+
+
+def search_events(db_conn, query, page=1, per_page=SEARCH_PAGE_SIZE, projection=None):
+    """
+    Ranked full-text search. Returns (events, has_next); each event carries
+    its relevance as `score`.
+    """
+    page = max(1, min(page, MAX_SEARCH_PAGE))
+    fields = dict(projection or {})
+    fields["score"] = {"$meta": "textScore"}
+    rows = list(db_conn.events.aggregate([
+        {"$match": {"$text": {"$search": query}}},
+        {"$sort": {"score": {"$meta": "textScore"}, "date": 1, "_id": 1}},
+        {"$skip": (page - 1) * per_page},
+        {"$limit": per_page + 1},
+        {"$project": fields}
+    ]))
+    has_next = len(rows) > per_page and page < MAX_SEARCH_PAGE
+    return rows[:per_page], has_next
+
+
+def autocomplete_titles(db_conn, text, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Event titles for a partly typed query: every complete word must be in
+    the title and the last, partial word must start one of its words.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return []
+    *complete, partial = words
+    if text[-1:].isspace():
+        # The last word has been finished too
+        complete.append(partial)
+        partial = None
+
+    conditions = []
+    if partial:
+        conditions.append({"title_keywords": {"$regex": f"^{re.escape(partial)}"}})
+    if complete:
+        conditions.append({"title_keywords": {"$all": complete}})
+    query = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    titles = []
+    for event in db_conn.events.find(query, {"title": 1, "_id": 0}).limit(limit * 3):
+        if event["title"] not in titles:
+            titles.append(event["title"])
+        if len(titles) == limit:
+            break
+    return titles
+
+
+def find_similar_events(db_conn, title, exclude_id=None, limit=3):
+    """Existing events whose text ranks closely to `title`, for duplicate warnings."""
+    match = {"$text": {"$search": title}}
+    if exclude_id is not None:
+        match["_id"] = {"$ne": exclude_id}
+    rows = db_conn.events.find(match, {"title": 1, "date": 1, "score": {"$meta": "textScore"}})
+    rows = rows.sort([("score", {"$meta": "textScore"})]).limit(limit)
+    # Below the title weight, the match came mostly from description or location
+    return [row for row in rows if row["score"] >= TEXT_WEIGHTS["title"]]